@@ -0,0 +1,86 @@
+"""
+Dynamic batching of single-item inference requests
+
+Endpoints that score one item at a time queue it here; a single worker
+coroutine groups queued items into one batched model call.
+"""
+import asyncio
+from typing import Optional
+
+class DynamicBatcher:
+    """
+    Coalesce single-item inference requests into batched service calls
+
+    Requests are queued together with a future; a single worker coroutine
+    drains up to ``max_batch_size`` items (waiting at most ``max_delay``
+    seconds after the first one arrives), calls ``batch_fn`` once and fans
+    the results back out to each waiting caller.
+    """
+
+    def __init__(self, batch_fn, max_batch_size: int = 32, max_delay: float = 0.05):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._server_loop())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def process_batched(self, item):
+        """Queue a single item and wait for its slice of the batch result"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _server_loop(self):
+        while True:
+            batch = await self._collect_batch()
+            items = [item for item, _ in batch]
+            try:
+                results = await self.batch_fn(items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            if len(results) != len(batch):
+                error = RuntimeError(
+                    f"Batch returned {len(results)} results for {len(batch)} items"
+                )
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,95 @@
+"""
+Lazily initialized AI service container
+
+Each service loads its models on first access, so a process only pays the
+load time and memory for the services it actually uses. Inference-only
+processes can ask for the neural models to be shared across worker
+processes and int8 quantized on load.
+"""
+from functools import cached_property
+
+from quantization import QUANTIZED_TYPES, quantize_service_models
+from shared_weights import check_shared_models, share_service_models, unlink_blocks
+
+# AI Services
+from services.categorization_service import CategorizationService
+from services.fraud_detection_service import FraudDetectionService
+from services.predictive_analytics_service import PredictiveAnalyticsService
+from services.receipt_validation_service import ReceiptValidationService
+from services.auto_tagging_service import AutoTaggingService
+from services.ocr_service import EnhancedOCRService
+
+class AIServices:
+    """Holds one instance of each AI service, created on first use"""
+
+    SERVICE_NAMES = (
+        "categorization",
+        "fraud_detection",
+        "predictive_analytics",
+        "receipt_validation",
+        "auto_tagging",
+        "ocr",
+    )
+
+    def __init__(self, quantize: bool = False, share_weights: bool = False, db=None, model_version=None):
+        # Both must stay off where models are retrained
+        self.quantize = quantize
+        self.share_weights = share_weights
+        # Retrained model generation; keeps shared weight blocks of different versions apart
+        self.model_version = model_version or 0
+        # Names of the shared weight blocks this process published
+        self._published = []
+        # Shared, pooled Motor database handle for services that read history/policies
+        self.db = db
+
+    def _for_inference(self, name: str, service):
+        """Prepare the categorization/fraud torch models for serving"""
+        # Layers about to be quantized get private int8 weights, so only the
+        # rest (e.g. embeddings) is shared; quantizing in place keeps it shared
+        exclude_types = QUANTIZED_TYPES if self.quantize else ()
+        if self.share_weights:
+            self._published += share_service_models(
+                f"{name}-v{self.model_version}", service, exclude_types
+            )
+        if self.quantize:
+            quantize_service_models(service)
+        if self.share_weights:
+            check_shared_models(name, service)
+        return service
+
+    def retire(self):
+        """
+        Unlink the shared weight blocks this container published
+
+        Called once a newer container has replaced it. Each worker unmaps a
+        block when its old models are garbage collected, which frees it.
+        """
+        unlink_blocks(self._published)
+        self._published.clear()
+
+    @cached_property
+    def categorization(self) -> CategorizationService:
+        return self._for_inference("categorization", CategorizationService())
+
+    @cached_property
+    def fraud_detection(self) -> FraudDetectionService:
+        return self._for_inference("fraud_detection", FraudDetectionService(db=self.db))
+
+    @cached_property
+    def predictive_analytics(self) -> PredictiveAnalyticsService:
+        return PredictiveAnalyticsService()
+
+    @cached_property
+    def receipt_validation(self) -> ReceiptValidationService:
+        return ReceiptValidationService()
+
+    @cached_property
+    def auto_tagging(self) -> AutoTaggingService:
+        return AutoTaggingService()
+
+    @cached_property
+    def ocr(self) -> EnhancedOCRService:
+        return EnhancedOCRService()
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self.__dict__
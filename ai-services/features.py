@@ -0,0 +1,36 @@
+"""
+Column-oriented request models for batched expense inference
+
+A batch arrives as parallel per-field lists (structure of arrays) instead of
+a list of ``ExpenseData`` objects, which keeps large batch payloads compact
+and cheap to parse; it is turned into rows once at the service boundary.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, model_validator
+
+class ExpenseBatch(BaseModel):
+    """Column-oriented (structure of arrays) batch of expenses"""
+
+    amounts: List[float]
+    descriptions: List[str]
+    vendors: List[Optional[str]]
+    dates: List[Optional[datetime]]
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        n = len(self.amounts)
+        if not (len(self.descriptions) == len(self.vendors) == len(self.dates) == n):
+            raise ValueError("amounts, descriptions, vendors and dates must have the same length")
+        return self
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """One ``ExpenseData`` field dict per expense"""
+        for amount, description, vendor, date in zip(
+            self.amounts, self.descriptions, self.vendors, self.dates
+        ):
+            yield {"amount": amount, "description": description, "vendor": vendor, "date": date}
@@ -1,22 +1,47 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import List, Optional, Dict, Any, Literal
 import uvicorn
 import asyncio
+import atexit
 import logging
+import logging.handlers
+import queue
 from datetime import datetime, timedelta
 import os
+import time
+import uuid
+import orjson
+import numpy as np
+import base64
+import hashlib
 from pathlib import Path
+from contextlib import asynccontextmanager
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from multiprocessing import shared_memory
+from starlette.formparsers import MultiPartParser
+import redis.asyncio as aioredis
+from motor.motor_asyncio import AsyncIOMotorClient
+from redis.exceptions import RedisError
+
+# One compute thread per process by default: `--workers` already spreads
+# requests across the cores, and a torch pool per worker oversubscribes them.
+# Must be set before torch is imported.
+COMPUTE_THREADS = int(os.environ.setdefault("AI_COMPUTE_THREADS", "1"))
+for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, str(COMPUTE_THREADS))
+import torch
 
 # AI Services
-from services.categorization_service import CategorizationService
-from services.fraud_detection_service import FraudDetectionService
-from services.predictive_analytics_service import PredictiveAnalyticsService
-from services.receipt_validation_service import ReceiptValidationService
-from services.auto_tagging_service import AutoTaggingService
-from services.ocr_service import EnhancedOCRService
+from batching import DynamicBatcher
+from container import AIServices
+from features import ExpenseBatch
 
 # Models
 from models.expense_models import ExpenseData, CategoryPrediction, FraudAlert, PredictionResult
@@ -27,16 +52,100 @@ from middleware.auth import verify_api_key
 from middleware.rate_limiting import rate_limit
 from middleware.logging import request_logger
 
+# Background jobs
+from tasks import JOB_TTL, MODEL_VERSION_KEY, job_key, retrain_models_task, process_receipt_task
+
 # Configuration
 from config.settings import settings
 
+# Services loaded at startup; receipt validation and OCR run in the OCR worker process
+PRELOAD_SERVICES = ("categorization", "fraud_detection", "auto_tagging", "predictive_analytics")
+
+MODEL_RELOAD_INTERVAL = 30  # seconds
+
+async def current_model_version() -> Optional[str]:
+    try:
+        return await app.state.redis.get(MODEL_VERSION_KEY)
+    except RedisError as e:
+        logger.warning("Model version lookup failed: %s", e)
+        return None
+
+async def load_ai_services(model_version: Optional[str]) -> AIServices:
+    """Build a service container and load the hot services concurrently; the rest load on first use"""
+    ai = AIServices(quantize=True, share_weights=True, db=app.state.db, model_version=model_version)
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *(loop.run_in_executor(None, getattr, ai, name) for name in PRELOAD_SERVICES)
+    )
+    return ai
+
+async def model_reload_loop():
+    """Swap in freshly saved models once a retraining job bumps the model version"""
+    while True:
+        await asyncio.sleep(MODEL_RELOAD_INTERVAL)
+        version = await current_model_version()
+        if version is None or version == app.state.model_version:
+            continue
+        logger.info("Reloading AI services for model version %s", version)
+        try:
+            ai = await load_ai_services(version)
+        except Exception as e:
+            logger.error("Model reload failed: %s", e)
+            continue
+        # Requests already running keep the old models until they finish;
+        # their shared blocks stay mapped until then
+        old_ai, app.state.ai = app.state.ai, ai
+        app.state.model_version = version
+        old_ai.retire()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop the background inference workers"""
+    torch.set_num_threads(COMPUTE_THREADS)
+    # One pooled MongoDB client per worker, shared by every service and request
+    app.state.mongo = AsyncIOMotorClient(
+        settings.MONGODB_URI,
+        minPoolSize=10,
+        maxPoolSize=50,
+        maxIdleTimeMS=300000
+    )
+    app.state.db = app.state.mongo.get_default_database()
+
+    app.state.redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    app.state.model_version = await current_model_version()
+    app.state.ai = await load_ai_services(app.state.model_version)
+    model_reloader = asyncio.create_task(model_reload_loop())
+    app.state.model_metrics = None
+    app.state.model_metrics_lock = asyncio.Lock()
+    app.state.category_batcher = DynamicBatcher(
+        categorize_batch, max_batch_size=32, max_delay=0.05
+    )
+    app.state.category_batcher.start()
+    app.state.ocr_executor = new_ocr_executor()
+    app.state.ocr_queue = asyncio.Queue()
+    ocr_worker = asyncio.create_task(ocr_server_loop(app.state.ocr_queue))
+    yield
+    for task in (ocr_worker, model_reloader):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    # Don't block the event loop on a receipt job still running
+    app.state.ocr_executor.shutdown(wait=False, cancel_futures=True)
+    await app.state.category_batcher.stop()
+    await app.state.redis.close()
+    app.state.mongo.close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Expense Management AI Services",
     description="Advanced AI/ML services for intelligent expense management",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -48,20 +157,271 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Logging configuration: records are handed to a background thread through a
+# queue so slow log output never blocks the event loop
+log_queue = queue.SimpleQueue()
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(
+    logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 )
+log_queue_handler = logging.handlers.QueueHandler(log_queue)
+log_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[log_queue_handler])
+# Tied to the process rather than the lifespan, which can run more than once;
+# stopping at exit flushes whatever is still queued
+log_listener = logging.handlers.QueueListener(log_queue, log_stream_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
-# Initialize AI services
-categorization_service = CategorizationService()
-fraud_detection_service = FraudDetectionService()
-predictive_analytics_service = PredictiveAnalyticsService()
-receipt_validation_service = ReceiptValidationService()
-auto_tagging_service = AutoTaggingService()
-ocr_service = EnhancedOCRService()
+# AI services used by the OCR worker process, loaded on its first job
+worker_services = AIServices()
+
+async def categorize_batch(expenses: List[ExpenseData]) -> List[CategoryPrediction]:
+    """Categorize a batch with the currently loaded models"""
+    return await app.state.ai.categorization.batch_predict(expenses)
+
+# === PREDICTION CACHE ===
+
+PREDICTION_CACHE_TTL = 3600  # seconds
+MODEL_METRICS_TTL = timedelta(hours=1)
+
+def prediction_cache_key(prefix: str, expense_data: ExpenseData) -> str:
+    """Cache key from the model version and normalized vendor, amount and description"""
+    description = (expense_data.description or "").strip().lower()
+    raw = f"{expense_data.vendor}|{round(expense_data.amount, 2)}|{description}"
+    digest = hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    return f"{prefix}:v{app.state.model_version or 0}:{digest}"
+
+@lru_cache(maxsize=None)
+def result_adapter(result_type) -> TypeAdapter:
+    return TypeAdapter(result_type)
+
+async def cached(key: str, fn, model_cls):
+    """
+    Return the cached prediction for ``key`` or compute it with ``fn``
+
+    Redis failures and entries that no longer validate (e.g. after a schema
+    change) are logged and treated as a cache miss so predictions keep
+    working. Results that cannot be serialized are returned without being
+    cached.
+    """
+    adapter = result_adapter(model_cls)
+    try:
+        value = await app.state.redis.get(key)
+        if value is not None:
+            return adapter.validate_json(value)
+    except (RedisError, ValueError) as e:
+        logger.warning("Prediction cache read failed: %s", e)
+
+    result = await fn()
+    try:
+        await app.state.redis.setex(key, PREDICTION_CACHE_TTL, adapter.dump_json(result))
+    except (RedisError, ValueError) as e:
+        logger.warning("Prediction cache write failed: %s", e)
+    return result
+
+class LocalLRUCache:
+    """Small in-process LRU with per-entry expiry, in front of Redis"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = PREDICTION_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+analytics_cache = LocalLRUCache()
+
+def content_digest(*parts) -> str:
+    """Stable digest of JSON-compatible request content"""
+    raw = orjson.dumps(parts, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def expenses_digest(expenses: List[ExpenseData]) -> str:
+    return content_digest([expense.model_dump(mode="json") for expense in expenses])
+
+async def cached_analytics(key: str, fn, result_type):
+    """``cached`` with an in-process LRU tier, for predictive analytics results"""
+    key = f"{key}:v{app.state.model_version or 0}"
+    result = analytics_cache.get(key)
+    if result is None:
+        result = await cached(key, fn, result_type)
+        analytics_cache.set(key, result)
+    return result
+
+def cached_value(model_cls, value):
+    """Validate a cached entry, or None if it is missing or no longer validates"""
+    if value is None:
+        return None
+    try:
+        return model_cls.model_validate_json(value)
+    except ValueError as e:
+        logger.warning("Prediction cache read failed: %s", e)
+        return None
+
+async def cached_batch(keys: List[str], items: List[Any], batch_fn, model_cls):
+    """Bulk variant of ``cached``: one MGET, run ``batch_fn`` on the misses only"""
+    if not keys:
+        return []
+    try:
+        values = await app.state.redis.mget(keys)
+    except RedisError as e:
+        logger.warning("Prediction cache read failed: %s", e)
+        values = [None] * len(keys)
+
+    results = [cached_value(model_cls, value) for value in values]
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        computed = await batch_fn([items[i] for i in misses])
+        try:
+            pipe = app.state.redis.pipeline(transaction=False)
+            for i, result in zip(misses, computed):
+                results[i] = result
+                pipe.setex(keys[i], PREDICTION_CACHE_TTL, result.model_dump_json())
+            await pipe.execute()
+        except RedisError as e:
+            logger.warning("Prediction cache write failed: %s", e)
+    return results
+
+# === RECEIPT PROCESSING WORKER ===
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Keep typical receipts in memory instead of spooling uploads over 1 MB to disk
+MultiPartParser.max_file_size = 4 * 1024 * 1024
+
+def init_ocr_worker():
+    """Log directly from the OCR worker process, which has no queue listener thread"""
+    root = logging.getLogger()
+    root.removeHandler(log_queue_handler)
+    root.addHandler(log_stream_handler)
+
+def run_receipt_job(kind: str, shm_name: str, length: int, enhance_image: bool = True):
+    """
+    Run a receipt validation/OCR job inside the OCR worker process
+
+    The upload is decoded straight from the shared memory block the API
+    process streamed it into, so it is never copied again or sent over the
+    executor's pipe. Services get a read-only ``uint8`` array over the block,
+    valid only for the duration of the call.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    content = np.frombuffer(shm.buf, dtype=np.uint8, count=length)
+    content.flags.writeable = False
+    try:
+        if kind == "validate":
+            return asyncio.run(worker_services.receipt_validation.validate_receipt_bytes(content))
+        return asyncio.run(worker_services.ocr.process_receipt_bytes(content, enhance_image))
+    finally:
+        # numpy holds no buffer export, so close() can't fail and mask an
+        # error; the view just mustn't be used once the block is unmapped
+        del content
+        shm.close()
+
+def new_ocr_executor() -> ProcessPoolExecutor:
+    # One OCR process per API worker, so a server runs `--workers` of them.
+    # Started from a fork server, not forked from this process: by then it
+    # runs torch/OpenMP, Motor and logging threads, and forking those deadlocks
+    return ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("forkserver"),
+        initializer=init_ocr_worker
+    )
+
+async def ocr_server_loop(queue: asyncio.Queue):
+    """
+    Serve queued receipt jobs one at a time on the worker process
+
+    Keeping Tesseract/OpenCV off the event loop thread lets other requests
+    proceed, and serializing jobs avoids duplicating model memory. If the
+    worker process dies (segfault, OOM) it is replaced for the next job.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        job, future = await queue.get()
+        try:
+            result = await loop.run_in_executor(app.state.ocr_executor, *job)
+        except BrokenProcessPool as e:
+            logger.error("OCR worker process died, restarting it: %s", e)
+            app.state.ocr_executor.shutdown(wait=False)
+            app.state.ocr_executor = new_ocr_executor()
+            if not future.done():
+                future.set_exception(e)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+def run_ocr_accuracy():
+    """Evaluate OCR accuracy inside the OCR worker process, where its models live"""
+    return asyncio.run(worker_services.ocr.get_accuracy())
+
+async def submit_ocr_call(fn, *args):
+    """Queue ``fn(*args)`` for the OCR worker process and wait for its result"""
+    future = asyncio.get_running_loop().create_future()
+    await app.state.ocr_queue.put(((fn, *args), future))
+    return await future
+
+async def upload_to_shared_memory(file: UploadFile):
+    """Stream an upload chunk by chunk into a new shared memory block"""
+    size = file.size
+    if size is None:
+        size = file.file.seek(0, os.SEEK_END)
+        file.file.seek(0)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    length = 0
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            shm.buf[length:length + len(chunk)] = chunk
+            length += len(chunk)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm, length
+
+async def submit_receipt_job(kind: str, file: UploadFile, enhance_image: bool = True):
+    """Queue a receipt job for the OCR worker and wait for its result"""
+    shm, length = await upload_to_shared_memory(file)
+    try:
+        return await submit_ocr_call(run_receipt_job, kind, shm.name, length, enhance_image)
+    finally:
+        shm.close()
+        shm.unlink()
+
+# === BACKGROUND JOBS ===
+
+async def enqueue_job(job_type: str, task, *args) -> str:
+    """Record a queued job in Redis and hand it to the Celery workers"""
+    job_id = uuid.uuid4().hex
+    now = datetime.utcnow().isoformat()
+    key = job_key(job_id)
+    await app.state.redis.hset(key, mapping={
+        "type": job_type,
+        "status": "queued",
+        "created_at": now,
+        "updated_at": now
+    })
+    await app.state.redis.expire(key, JOB_TTL)
+    await asyncio.to_thread(task.apply_async, args=(job_id, *args), task_id=job_id)
+    return job_id
 
 # Health check endpoint
 @app.get("/health")
@@ -72,12 +432,8 @@ async def health_check():
         "timestamp": datetime.utcnow().isoformat(),
         "version": "1.0.0",
         "services": {
-            "categorization": "active",
-            "fraud_detection": "active",
-            "predictive_analytics": "active",
-            "receipt_validation": "active",
-            "auto_tagging": "active",
-            "ocr": "active"
+            name: "active" if app.state.ai.is_loaded(name) else "idle"
+            for name in AIServices.SERVICE_NAMES
         }
     }
 
@@ -97,11 +453,15 @@ async def categorize_expense(
     - **Historical pattern analysis**: Learning from user's expense history
     """
     try:
-        result = await categorization_service.predict_category(expense_data)
-        logger.info(f"Category prediction completed for expense: {expense_data.description}")
+        result = await cached(
+            prediction_cache_key("cat", expense_data),
+            lambda: app.state.category_batcher.process_batched(expense_data),
+            CategoryPrediction
+        )
+        logger.info("Category prediction completed for expense: %s", expense_data.description)
         return result
     except Exception as e:
-        logger.error(f"Categorization error: {str(e)}")
+        logger.error("Categorization error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to categorize expense")
 
 @app.post("/api/v1/batch-categorize", response_model=List[CategoryPrediction])
@@ -113,11 +473,45 @@ async def batch_categorize_expenses(
     Batch categorization for multiple expenses
     """
     try:
-        results = await categorization_service.batch_predict(expenses)
-        logger.info(f"Batch categorization completed for {len(expenses)} expenses")
+        results = await cached_batch(
+            [prediction_cache_key("cat", expense) for expense in expenses],
+            expenses,
+            categorize_batch,
+            CategoryPrediction
+        )
+        logger.info("Batch categorization completed for %s expenses", len(expenses))
         return results
     except Exception as e:
-        logger.error(f"Batch categorization error: {str(e)}")
+        logger.error("Batch categorization error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to process batch categorization")
+
+@app.post("/api/v1/batch-categorize-soa", response_model=List[CategoryPrediction])
+async def batch_categorize_expense_columns(
+    batch: ExpenseBatch,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Batch categorization for a column-oriented batch
+
+    Takes parallel ``amounts``/``descriptions``/``vendors``/``dates`` arrays;
+    shares the prediction cache and batch path of ``/batch-categorize``.
+    """
+    try:
+        expenses = [ExpenseData(**row) for row in batch.rows()]
+    except ValueError as e:
+        # Same status FastAPI gives /batch-categorize for an invalid expense
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        results = await cached_batch(
+            [prediction_cache_key("cat", expense) for expense in expenses],
+            expenses,
+            categorize_batch,
+            CategoryPrediction
+        )
+        logger.info("Batch categorization completed for %s expenses", len(batch))
+        return results
+    except Exception as e:
+        logger.error("Batch categorization error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to process batch categorization")
 
 # === FRAUD DETECTION ENDPOINTS ===
@@ -137,11 +531,13 @@ async def detect_fraud(
     - **Behavioral analysis**: User behavior pattern analysis
     """
     try:
-        result = await fraud_detection_service.analyze_expense(expense_data, user_history)
-        logger.info(f"Fraud analysis completed for expense: {expense_data.description}")
+        # Never cached: verdicts depend on the user's stored history, so a
+        # resubmitted expense must be re-checked for duplicates
+        result = await app.state.ai.fraud_detection.analyze_expense(expense_data, user_history)
+        logger.info("Fraud analysis completed for expense: %s", expense_data.description)
         return result
     except Exception as e:
-        logger.error(f"Fraud detection error: {str(e)}")
+        logger.error("Fraud detection error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to analyze expense for fraud")
 
 @app.post("/api/v1/risk-assessment")
@@ -154,12 +550,12 @@ async def assess_risk_score(
     Calculate comprehensive risk score for expense
     """
     try:
-        risk_score = await fraud_detection_service.calculate_risk_score(
+        risk_score = await app.state.ai.fraud_detection.calculate_risk_score(
             expense_data, company_policies
         )
         return {"risk_score": risk_score, "timestamp": datetime.utcnow()}
     except Exception as e:
-        logger.error(f"Risk assessment error: {str(e)}")
+        logger.error("Risk assessment error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to assess risk score")
 
 # === PREDICTIVE ANALYTICS ENDPOINTS ===
@@ -178,29 +574,37 @@ async def predict_budget(
     - **Category-wise forecasting**: Detailed predictions for each expense category
     """
     try:
-        result = await predictive_analytics_service.predict_budget(
-            historical_data, prediction_months
+        result = await cached_analytics(
+            f"budget:{expenses_digest(historical_data)}:{prediction_months}",
+            lambda: app.state.ai.predictive_analytics.predict_budget(
+                historical_data, prediction_months
+            ),
+            PredictionResult
         )
-        logger.info(f"Budget prediction completed for {prediction_months} months")
+        logger.info("Budget prediction completed for %s months", prediction_months)
         return result
     except Exception as e:
-        logger.error(f"Budget prediction error: {str(e)}")
+        logger.error("Budget prediction error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to predict budget")
 
 @app.post("/api/v1/analyze-trends")
 async def analyze_spending_trends(
     expenses: List[ExpenseData],
-    analysis_type: str = Field(default="monthly", regex="^(weekly|monthly|quarterly)$"),
+    analysis_type: Literal["weekly", "monthly", "quarterly"] = "monthly",
     api_key: str = Depends(verify_api_key)
 ):
     """
     Advanced spending trend analysis
     """
     try:
-        trends = await predictive_analytics_service.analyze_trends(expenses, analysis_type)
+        trends = await cached_analytics(
+            f"trends:{expenses_digest(expenses)}:{analysis_type}",
+            lambda: app.state.ai.predictive_analytics.analyze_trends(expenses, analysis_type),
+            Any
+        )
         return {"trends": trends, "analysis_type": analysis_type}
     except Exception as e:
-        logger.error(f"Trend analysis error: {str(e)}")
+        logger.error("Trend analysis error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to analyze spending trends")
 
 @app.post("/api/v1/predict-approval-time")
@@ -213,8 +617,13 @@ async def predict_approval_time(
     Predict expense approval processing time
     """
     try:
-        prediction = await predictive_analytics_service.predict_approval_time(
-            expense_data, approval_history
+        history_hash = content_digest(approval_history)
+        prediction = await cached_analytics(
+            f"approval:{history_hash}:{content_digest(expense_data.model_dump(mode='json'))}",
+            lambda: app.state.ai.predictive_analytics.predict_approval_time(
+                expense_data, approval_history
+            ),
+            Any
         )
         return {
             "estimated_hours": prediction,
@@ -222,7 +631,7 @@ async def predict_approval_time(
             "timestamp": datetime.utcnow()
         }
     except Exception as e:
-        logger.error(f"Approval time prediction error: {str(e)}")
+        logger.error("Approval time prediction error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to predict approval time")
 
 # === RECEIPT VALIDATION ENDPOINTS ===
@@ -241,21 +650,12 @@ async def validate_receipt(
     - **Anti-fraud detection**: Identifies potentially fake receipts
     """
     try:
-        # Save uploaded file temporarily
-        file_path = f"/tmp/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        result = await receipt_validation_service.validate_receipt(file_path)
+        result = await submit_receipt_job("validate", file)
         
-        # Clean up temporary file
-        os.remove(file_path)
-        
-        logger.info(f"Receipt validation completed for file: {file.filename}")
+        logger.info("Receipt validation completed for file: %s", file.filename)
         return result
     except Exception as e:
-        logger.error(f"Receipt validation error: {str(e)}")
+        logger.error("Receipt validation error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to validate receipt")
 
 @app.post("/api/v1/enhanced-ocr", response_model=OCRResult)
@@ -273,22 +673,53 @@ async def enhanced_ocr_processing(
     - **Confidence scoring**: Provides confidence scores for extracted data
     """
     try:
-        file_path = f"/tmp/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        result = await ocr_service.process_receipt(file_path, enhance_image)
-        
-        # Clean up temporary file
-        os.remove(file_path)
+        result = await submit_receipt_job("ocr", file, enhance_image)
         
-        logger.info(f"Enhanced OCR completed for file: {file.filename}")
+        logger.info("Enhanced OCR completed for file: %s", file.filename)
         return result
     except Exception as e:
-        logger.error(f"Enhanced OCR error: {str(e)}")
+        logger.error("Enhanced OCR error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to process OCR")
 
+@app.post("/api/v1/jobs/validate-receipt", status_code=202)
+async def validate_receipt_job(
+    file: UploadFile = File(...),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Queue receipt validation as a background job for large or multi-page uploads
+    """
+    try:
+        content = await file.read()
+        job_id = await enqueue_job(
+            "validate_receipt", process_receipt_task,
+            "validate", base64.b64encode(content).decode()
+        )
+        return {"job_id": job_id, "status": "queued"}
+    except Exception as e:
+        logger.error("Receipt validation job error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to queue receipt validation")
+
+@app.post("/api/v1/jobs/enhanced-ocr", status_code=202)
+async def enhanced_ocr_job(
+    file: UploadFile = File(...),
+    enhance_image: bool = True,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Queue enhanced OCR as a background job for large or multi-page uploads
+    """
+    try:
+        content = await file.read()
+        job_id = await enqueue_job(
+            "enhanced_ocr", process_receipt_task,
+            "ocr", base64.b64encode(content).decode(), enhance_image
+        )
+        return {"job_id": job_id, "status": "queued"}
+    except Exception as e:
+        logger.error("Enhanced OCR job error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to queue OCR processing")
+
 # === AUTO-TAGGING ENDPOINTS ===
 
 @app.post("/api/v1/auto-tag")
@@ -305,8 +736,10 @@ async def auto_tag_expense(
     - **Location extraction**: Geographic information extraction
     """
     try:
-        tags = await auto_tagging_service.generate_tags(expense_data)
-        metadata = await auto_tagging_service.extract_metadata(expense_data)
+        tags, metadata = await asyncio.gather(
+            app.state.ai.auto_tagging.generate_tags(expense_data),
+            app.state.ai.auto_tagging.extract_metadata(expense_data)
+        )
         
         return {
             "tags": tags,
@@ -315,7 +748,7 @@ async def auto_tag_expense(
             "timestamp": datetime.utcnow()
         }
     except Exception as e:
-        logger.error(f"Auto-tagging error: {str(e)}")
+        logger.error("Auto-tagging error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to generate tags")
 
 # === ANALYTICS ENDPOINTS ===
@@ -324,18 +757,39 @@ async def auto_tag_expense(
 async def get_model_performance(api_key: str = Depends(verify_api_key)):
     """
     Get AI model performance metrics
+
+    Metrics are cached for an hour and refreshed early once retrained
+    models have been loaded.
     """
     try:
-        metrics = {
-            "categorization_accuracy": await categorization_service.get_accuracy(),
-            "fraud_detection_precision": await fraud_detection_service.get_precision(),
-            "prediction_mae": await predictive_analytics_service.get_mae(),
-            "ocr_accuracy": await ocr_service.get_accuracy(),
-            "last_updated": datetime.utcnow()
-        }
-        return metrics
+        version = app.state.model_version
+        async with app.state.model_metrics_lock:
+            cached_metrics = app.state.model_metrics
+            if (
+                cached_metrics is None
+                or cached_metrics["version"] != version
+                or datetime.utcnow() - cached_metrics["metrics"]["last_updated"] > MODEL_METRICS_TTL
+            ):
+                accuracy, precision, mae, ocr_accuracy = await asyncio.gather(
+                    app.state.ai.categorization.get_accuracy(),
+                    app.state.ai.fraud_detection.get_precision(),
+                    app.state.ai.predictive_analytics.get_mae(),
+                    submit_ocr_call(run_ocr_accuracy)
+                )
+                cached_metrics = {
+                    "version": version,
+                    "metrics": {
+                        "categorization_accuracy": accuracy,
+                        "fraud_detection_precision": precision,
+                        "prediction_mae": mae,
+                        "ocr_accuracy": ocr_accuracy,
+                        "last_updated": datetime.utcnow()
+                    }
+                }
+                app.state.model_metrics = cached_metrics
+        return cached_metrics["metrics"]
     except Exception as e:
-        logger.error(f"Performance metrics error: {str(e)}")
+        logger.error("Performance metrics error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to retrieve model performance")
 
 @app.post("/api/v1/retrain-models")
@@ -347,64 +801,71 @@ async def retrain_models(
     Trigger model retraining with new data
     """
     try:
-        # Background task for model retraining
-        asyncio.create_task(retrain_models_background(training_data))
+        # Durable background job, tracked via /api/v1/jobs/{job_id}
+        job_id = await enqueue_job("retrain_models", retrain_models_task, training_data)
         
         return {
-            "status": "retraining_started",
+            "job_id": job_id,
+            "status": "retraining_queued",
             "estimated_completion": datetime.utcnow() + timedelta(hours=2),
-            "message": "Model retraining initiated successfully"
+            "message": "Model retraining queued successfully"
         }
     except Exception as e:
-        logger.error(f"Model retraining error: {str(e)}")
+        logger.error("Model retraining error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to initiate model retraining")
 
-async def retrain_models_background(training_data: Dict[str, List[Dict[str, Any]]]):
-    """Background task for model retraining"""
+@app.get("/api/v1/jobs/{job_id}")
+async def get_job_status(job_id: str, api_key: str = Depends(verify_api_key)):
+    """
+    Get the status and result of a background job
+    """
     try:
-        logger.info("Starting model retraining process...")
-        
-        # Retrain categorization models
-        if "categorization" in training_data:
-            await categorization_service.retrain(training_data["categorization"])
-        
-        # Retrain fraud detection models
-        if "fraud_detection" in training_data:
-            await fraud_detection_service.retrain(training_data["fraud_detection"])
-        
-        # Retrain predictive models
-        if "predictions" in training_data:
-            await predictive_analytics_service.retrain(training_data["predictions"])
-        
-        logger.info("Model retraining completed successfully")
+        job = await app.state.redis.hgetall(job_key(job_id))
     except Exception as e:
-        logger.error(f"Background retraining error: {str(e)}")
+        logger.error("Job status error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to retrieve job status")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return {
+        "job_id": job_id,
+        "type": job.get("type"),
+        "status": job.get("status"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+        "result": orjson.loads(job["result"]) if "result" in job else None,
+        "error": job.get("error")
+    }
 
 # === WEBSOCKET ENDPOINTS ===
 
 @app.websocket("/ws/real-time-analysis")
-async def websocket_real_time_analysis(websocket):
+async def websocket_real_time_analysis(websocket: WebSocket):
     """
     Real-time expense analysis via WebSocket
+
+    Messages from all connected clients share the categorization batcher,
+    so concurrent sockets are categorized together.
     """
     await websocket.accept()
     try:
         while True:
-            data = await websocket.receive_json()
-            expense_data = ExpenseData(**data)
+            expense_data = ExpenseData.model_validate_json(await websocket.receive_text())
             
             # Perform real-time analysis
-            category = await categorization_service.predict_category(expense_data)
-            fraud_alert = await fraud_detection_service.analyze_expense(expense_data)
+            category, fraud_alert = await asyncio.gather(
+                app.state.category_batcher.process_batched(expense_data),
+                app.state.ai.fraud_detection.analyze_expense(expense_data)
+            )
             
             # Send results back
-            await websocket.send_json({
-                "category": category.dict(),
-                "fraud_alert": fraud_alert.dict(),
-                "timestamp": datetime.utcnow().isoformat()
-            })
+            await websocket.send_text(orjson.dumps({
+                "category": category.model_dump(),
+                "fraud_alert": fraud_alert.model_dump(),
+                "timestamp": datetime.utcnow()
+            }).decode())
     except Exception as e:
-        logger.error(f"WebSocket error: {str(e)}")
+        logger.error("WebSocket error: %s", e)
         await websocket.close()
 
 if __name__ == "__main__":
@@ -413,5 +874,9 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
+        # Reload mode only supports a single worker
+        workers=1 if settings.DEBUG else os.cpu_count(),
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Share read-only torch weights between API worker processes
+
+Under ``uvicorn --workers N`` each worker would otherwise keep a private copy
+of every model. The first worker to load a model copies its tensors into a
+named POSIX shared memory block; the other workers attach to that block and
+point their parameters at it, so the weights are held in RAM once.
+
+Blocks are scoped to the server's parent process and named per model
+version, so a restart or a retrained model always publishes fresh weights.
+When a model is replaced its block is unlinked, and each worker unmaps it
+once the old model has been garbage collected.
+"""
+import logging
+import os
+import time
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional
+
+import numpy as np
+import torch
+from torch import nn
+
+logger = logging.getLogger(__name__)
+
+HEADER_BYTES = 64  # ready flag, padded so tensor data stays 64-byte aligned
+ATTACH_TIMEOUT = 60.0  # seconds
+
+NUMPY_DTYPES = {
+    torch.float32: np.float32,
+    torch.float16: np.float16,
+    torch.float64: np.float64,
+    torch.int64: np.int64,
+    torch.int32: np.int32,
+    torch.uint8: np.uint8,
+    torch.bool: np.bool_,
+}
+
+# Model -> the block backing its tensors. numpy doesn't hold a buffer export
+# on the block, so nothing stops it from being unmapped under live tensors;
+# instead it stays mapped for as long as the model that uses it.
+_blocks = weakref.WeakKeyDictionary()
+
+def _layout(state):
+    layout = []
+    offset = HEADER_BYTES
+    for key, tensor in state.items():
+        layout.append((key, offset))
+        nbytes = tensor.numel() * tensor.element_size()
+        offset += (nbytes + 63) // 64 * 64
+    return layout, offset
+
+def _tensor_view(shm, tensor, offset):
+    array = np.ndarray(tensor.shape, dtype=NUMPY_DTYPES[tensor.dtype], buffer=shm.buf, offset=offset)
+    return torch.from_numpy(array)
+
+def _open_segment(name: str, size: int):
+    """
+    Create the block, or attach to it if another worker already has
+
+    The publisher creates the file before sizing it, so an attacher that gets
+    in between sees an empty file; it backs off and retries until
+    ``ATTACH_TIMEOUT``. Returns ``(None, False)`` if the block never appears.
+    """
+    deadline = time.monotonic() + ATTACH_TIMEOUT
+    delay = 0.01
+    while True:
+        try:
+            return shared_memory.SharedMemory(name=name, create=True, size=size), True
+        except FileExistsError:
+            pass
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except (ValueError, FileNotFoundError):
+            # Not sized yet ("cannot mmap an empty file"), or unlinked meanwhile
+            if time.monotonic() > deadline:
+                return None, False
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+            continue
+        # Attached blocks belong to the publishing worker; don't unlink them on exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm, False
+
+def _shareable_state(module: nn.Module, exclude_types=()):
+    """CPU tensors worth sharing, minus those owned by an ``exclude_types`` layer"""
+    excluded = set()
+    for prefix, child in module.named_modules():
+        if exclude_types and isinstance(child, tuple(exclude_types)):
+            excluded.update(
+                f"{prefix}.{key}" if prefix else key
+                for key in child.state_dict(keep_vars=True)
+            )
+    return {
+        key: tensor for key, tensor in module.state_dict().items()
+        if key not in excluded and isinstance(tensor, torch.Tensor)
+        and tensor.device.type == "cpu" and tensor.dtype in NUMPY_DTYPES
+    }
+
+def share_module(name: str, module: nn.Module, exclude_types=()) -> Optional[str]:
+    """
+    Back ``module``'s CPU tensors with the shared block ``name``
+
+    Tensors of ``exclude_types`` layers (ones about to be quantized, which
+    replaces their weights) are left private. Returns the block's full name
+    if this process published it, for ``unlink_blocks``.
+    """
+    state = _shareable_state(module, exclude_types)
+    if not state:
+        return None
+
+    layout, size = _layout(state)
+    shm, publisher = _open_segment(f"{name}-{os.getppid()}", size)
+    if shm is None:
+        logger.warning("Timed out attaching shared weights %s; keeping a private copy", name)
+        return None
+    if shm.size < size:
+        logger.warning("Shared weights %s do not match the loaded model; keeping a private copy", name)
+        shm.close()
+        return None
+
+    if publisher:
+        for key, offset in layout:
+            _tensor_view(shm, state[key], offset).copy_(state[key])
+        shm.buf[0] = 1
+    else:
+        deadline = time.monotonic() + ATTACH_TIMEOUT
+        while shm.buf[0] != 1:
+            if time.monotonic() > deadline:
+                logger.warning("Timed out attaching shared weights %s; keeping a private copy", name)
+                shm.close()
+                return None
+            time.sleep(0.05)
+
+    shared = {key: _tensor_view(shm, state[key], offset) for key, offset in layout}
+    module.load_state_dict(shared, strict=False, assign=True)
+    _blocks[module] = shm
+    weakref.finalize(module, shm.close)
+    logger.info("%s shared weights %s", "Published" if publisher else "Attached to", name)
+    return shm.name if publisher else None
+
+def share_service_models(service_name: str, service, exclude_types=()) -> List[str]:
+    """
+    Share every torch model held by ``service`` across workers
+
+    Returns the names of the blocks this process published.
+    """
+    published = []
+    for attr, value in list(vars(service).items()):
+        if isinstance(value, nn.Module):
+            name = share_module(f"ai-{service_name}-{attr}", value, exclude_types)
+            if name is not None:
+                published.append(name)
+    return published
+
+def unlink_blocks(names: List[str]):
+    """
+    Remove published blocks so no new worker can attach to them
+
+    Only the names go: each worker keeps its mapping until its old models
+    are garbage collected, and the memory is freed after the last one.
+    """
+    for name in names:
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        shm.close()
+        # Also unregisters the block from this process's resource tracker
+        shm.unlink()
+
+def _block_range(module: nn.Module):
+    shm = _blocks.get(module)
+    if shm is None:
+        return 0, 0
+    view = np.frombuffer(shm.buf, dtype=np.uint8)
+    start = view.ctypes.data
+    return start, start + view.nbytes
+
+def private_tensor_count(module: nn.Module, exclude_types=()) -> int:
+    """Number of ``module``'s shareable tensors not backed by its shared block"""
+    start, end = _block_range(module)
+    count = 0
+    for tensor in _shareable_state(module, exclude_types).values():
+        # Scalars (e.g. a quantized layer's scale/zero_point) aren't worth sharing
+        if tensor.dim() == 0:
+            continue
+        if not start <= tensor.data_ptr() < end:
+            count += 1
+    return count
+
+def shared_bytes(module: nn.Module) -> int:
+    """Bytes of ``module``'s tensors that live in its shared block"""
+    start, end = _block_range(module)
+    return sum(
+        tensor.numel() * tensor.element_size()
+        for tensor in module.state_dict().values()
+        if isinstance(tensor, torch.Tensor) and not tensor.is_quantized
+        and start <= tensor.data_ptr() < end
+    )
+
+def check_shared_models(service_name: str, service, exclude_types=()):
+    """Warn when a service's models hold private copies of shareable weights"""
+    for attr, value in vars(service).items():
+        if isinstance(value, nn.Module):
+            private = private_tensor_count(value, exclude_types)
+            if private:
+                logger.warning("Model %s.%s keeps %s tensors out of shared memory", service_name, attr, private)
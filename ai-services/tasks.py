@@ -0,0 +1,128 @@
+"""
+Celery tasks for long-running AI jobs
+
+Job state is kept in a Redis hash ``job:{id}`` so the API can report status
+and results independently of the worker that runs the job. Workers run as a
+separate process and can be scaled on their own:
+
+    celery -A tasks worker --loglevel=info --concurrency=1
+"""
+import asyncio
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+import redis
+from celery import Celery
+
+# AI Services
+from container import AIServices
+
+# Configuration
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_TTL = 7 * 24 * 3600  # seconds
+MODEL_VERSION_KEY = "models:version"
+RETRAIN_TIME_LIMIT = 4 * 3600  # seconds
+RECEIPT_TIME_LIMIT = 10 * 60  # seconds
+# Deliveries of one job before it is marked failed (e.g. a worker that keeps OOMing)
+MAX_JOB_ATTEMPTS = 3
+
+celery_app = Celery("ai_services", broker=settings.REDIS_URL)
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    # Unacked tasks are redelivered after this long; it must outlast the
+    # longest task or a running retrain gets started a second time
+    broker_transport_options={"visibility_timeout": RETRAIN_TIME_LIMIT + 3600},
+)
+
+redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# AI services, loaded on first use by the tasks that need them
+services = AIServices()
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+def update_job(job_id: str, **fields):
+    """Update the job hash and refresh its expiry"""
+    fields["updated_at"] = datetime.utcnow().isoformat()
+    key = job_key(job_id)
+    redis_client.hset(key, mapping=fields)
+    redis_client.expire(key, JOB_TTL)
+
+def serialize_result(result: Any) -> str:
+    if hasattr(result, "model_dump_json"):
+        return result.model_dump_json()
+    return json.dumps(result, default=str)
+
+def run_job(job_id: str, coro) -> bool:
+    """
+    Run a service coroutine to completion, recording its outcome
+
+    Returns False without running it once the job has been delivered more
+    than ``MAX_JOB_ATTEMPTS`` times.
+    """
+    attempts = redis_client.hincrby(job_key(job_id), "attempts", 1)
+    if attempts > MAX_JOB_ATTEMPTS:
+        coro.close()
+        logger.error("Job %s abandoned after %s attempts", job_id, MAX_JOB_ATTEMPTS)
+        update_job(job_id, status="failed", error=f"Abandoned after {MAX_JOB_ATTEMPTS} attempts")
+        return False
+
+    update_job(job_id, status="running")
+    try:
+        result = asyncio.run(coro)
+    except Exception as e:
+        logger.error("Job %s failed: %s", job_id, e)
+        update_job(job_id, status="failed", error=str(e))
+        raise
+    update_job(job_id, status="completed", result=serialize_result(result))
+    return True
+
+async def retrain_models(training_data: Dict[str, List[Dict[str, Any]]]):
+    """Retrain each model that has training data"""
+    logger.info("Starting model retraining process...")
+
+    # Retrain categorization models
+    if "categorization" in training_data:
+        await services.categorization.retrain(training_data["categorization"])
+        await services.categorization.save_models()
+
+    # Retrain fraud detection models
+    if "fraud_detection" in training_data:
+        await services.fraud_detection.retrain(training_data["fraud_detection"])
+        await services.fraud_detection.save_models()
+
+    # Retrain predictive models
+    if "predictions" in training_data:
+        await services.predictive_analytics.retrain(training_data["predictions"])
+        await services.predictive_analytics.save_models()
+
+    logger.info("Model retraining completed successfully")
+
+@celery_app.task(name="ai_services.retrain_models", time_limit=RETRAIN_TIME_LIMIT)
+def retrain_models_task(job_id: str, training_data: Dict[str, List[Dict[str, Any]]]):
+    if run_job(job_id, retrain_models(training_data)):
+        # API workers reload the saved models, and drop cached predictions and
+        # metrics, once they see the new version
+        redis_client.incr(MODEL_VERSION_KEY)
+    return job_id
+
+@celery_app.task(name="ai_services.process_receipt", time_limit=RECEIPT_TIME_LIMIT)
+def process_receipt_task(job_id: str, kind: str, content_b64: str, enhance_image: bool = True):
+    content = base64.b64decode(content_b64)
+    if kind == "validate":
+        coro = services.receipt_validation.validate_receipt_bytes(content)
+    else:
+        coro = services.ocr.process_receipt_bytes(content, enhance_image)
+    run_job(job_id, coro)
+    return job_id
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from batching import DynamicBatcher
+
+def run_with_batcher(batch_fn, main, **kwargs):
+    async def runner():
+        batcher = DynamicBatcher(batch_fn, **kwargs)
+        batcher.start()
+        try:
+            return await main(batcher)
+        finally:
+            await batcher.stop()
+    return asyncio.run(runner())
+
+def test_coalesces_up_to_max_batch_size():
+    calls = []
+
+    async def double(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    async def main(batcher):
+        return await asyncio.gather(*(batcher.process_batched(i) for i in range(10)))
+
+    results = run_with_batcher(double, main, max_batch_size=4, max_delay=1.0)
+    assert results == [i * 2 for i in range(10)]
+    assert [len(call) for call in calls] == [4, 4, 2]
+    assert sum(calls, []) == list(range(10))
+
+def test_flushes_partial_batch_after_max_delay():
+    calls = []
+
+    async def echo(items):
+        calls.append(list(items))
+        return items
+
+    async def main(batcher):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await batcher.process_batched("a")
+        return result, loop.time() - started
+
+    result, elapsed = run_with_batcher(echo, main, max_batch_size=32, max_delay=0.05)
+    assert result == "a"
+    assert calls == [["a"]]
+    assert 0.04 <= elapsed < 1.0
+
+def test_exception_fans_out_to_every_caller():
+    async def fail(items):
+        raise ValueError("model error")
+
+    async def main(batcher):
+        return await asyncio.gather(
+            *(batcher.process_batched(i) for i in range(3)), return_exceptions=True
+        )
+
+    results = run_with_batcher(fail, main, max_batch_size=8, max_delay=0.01)
+    assert all(isinstance(r, ValueError) for r in results)
+
+def test_length_mismatch_fails_the_whole_batch():
+    async def short(items):
+        return items[:-1]
+
+    async def main(batcher):
+        return await asyncio.gather(
+            *(batcher.process_batched(i) for i in range(3)), return_exceptions=True
+        )
+
+    results = run_with_batcher(short, main, max_batch_size=8, max_delay=0.01)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_keeps_serving_after_a_failed_batch():
+    async def fail_first(items):
+        if items == ["bad"]:
+            raise ValueError("model error")
+        return items
+
+    async def main(batcher):
+        with pytest.raises(ValueError):
+            await batcher.process_batched("bad")
+        return await batcher.process_batched("good")
+
+    assert run_with_batcher(fail_first, main, max_batch_size=8, max_delay=0.01) == "good"
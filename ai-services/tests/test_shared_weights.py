@@ -0,0 +1,88 @@
+import gc
+import os
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+from torch import nn
+
+import shared_weights
+from quantization import QUANTIZED_TYPES, quantize_dynamic_int8
+from shared_weights import private_tensor_count, share_module, shared_bytes, unlink_blocks
+
+@pytest.fixture
+def share(request):
+    """share_module under a per-test name, unlinking what it publishes"""
+    published = []
+
+    def share(module, exclude_types=()):
+        name = share_module(f"test-{request.node.name}-{len(published)}", module, exclude_types)
+        published.append(name)
+        return name
+
+    yield share
+    unlink_blocks([name for name in published if name is not None])
+
+def model():
+    return nn.Sequential(nn.Embedding(10, 8), nn.Linear(8, 4))
+
+def test_shared_module_has_no_private_tensors(share):
+    m = model()
+    assert share(m) is not None
+    assert private_tensor_count(m) == 0
+
+def test_quantizing_keeps_unquantized_weights_shared(share):
+    m = model()
+    share(m, QUANTIZED_TYPES)
+    m = quantize_dynamic_int8(m)
+    assert isinstance(m[1], torch.ao.nn.quantized.dynamic.Linear)
+    assert private_tensor_count(m) == 0
+    assert m(torch.tensor([1, 2])).shape == (2, 4)
+
+def test_layers_to_quantize_are_left_out_of_the_block(share):
+    m = model()
+    share(m, QUANTIZED_TYPES)
+    quantize_dynamic_int8(m)
+    assert shared_bytes(m) == m[0].weight.numel() * m[0].weight.element_size()
+
+def test_no_block_when_every_layer_is_quantized(share):
+    m = nn.Sequential(nn.Linear(8, 8), nn.Linear(8, 4))
+    assert share(m, QUANTIZED_TYPES) is None
+    assert m not in shared_weights._blocks
+
+def test_model_still_runs_after_its_block_is_unlinked(share):
+    m = model()
+    name = share(m, QUANTIZED_TYPES)
+    quantize_dynamic_int8(m)
+    expected = m(torch.tensor([1, 9]))
+    unlink_blocks([name])
+    gc.collect()
+    assert torch.equal(m(torch.tensor([1, 9])), expected)
+
+def test_block_is_closed_with_its_model(share):
+    m = model()
+    share(m)
+    shm = shared_weights._blocks[m]
+    del m
+    gc.collect()
+    assert shm.buf is None
+
+def test_unshared_module_is_private():
+    assert private_tensor_count(model()) == 3
+
+def test_attach_waits_for_block_to_be_sized(request):
+    # A publisher that has created, but not yet sized, the block
+    name = f"test-{request.node.name}-{os.getpid()}"
+    fd = os.open(f"/dev/shm/{name}", os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o600)
+    timer = threading.Timer(0.2, os.ftruncate, (fd, 4096))
+    timer.start()
+    try:
+        shm, publisher = shared_weights._open_segment(name, 4096)
+        assert not publisher
+        assert shm.size == 4096
+        shm.close()
+    finally:
+        timer.join()
+        os.close(fd)
+        os.unlink(f"/dev/shm/{name}")